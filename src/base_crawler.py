@@ -1,24 +1,92 @@
-from typing import Tuple, Optional
-from urllib.parse import urlparse
+import asyncio
+from typing import Tuple, Optional, Union
 from database import Database
 from domain_exclusions import DomainExclusions
 from logger import Logger
 from crawl4ai import AsyncWebCrawler
 from datetime import datetime
 
+class CrawlerPool:
+    """A fixed set of long-lived AsyncWebCrawlers shared by every crawl.
+
+    Starting a crawler launches a browser, so the pool starts them once and
+    spreads arun() calls over them. A crawler opens a page per call, so each
+    one serves up to crawls_per_crawler calls at once; callers wait beyond that.
+    It can be passed to BaseCrawler in place of a single AsyncWebCrawler.
+    """
+
+    def __init__(self, size: int, crawls_per_crawler: int = 4):
+        self.crawlers = [AsyncWebCrawler() for _ in range(max(size, 1))]
+        self._slots = asyncio.Semaphore(len(self.crawlers) * max(crawls_per_crawler, 1))
+        self._started = []
+        # In-flight arun() calls per started crawler
+        self._load = {}
+        self.running = False
+
+    async def __aenter__(self):
+        try:
+            for crawler in self.crawlers:
+                await crawler.__aenter__()
+                self._started.append(crawler)
+                self._load[crawler] = 0
+        except BaseException:
+            # Don't leak the browsers that did start; the startup error is the one to report
+            await self._close_started(None, None, None)
+            raise
+        self.running = True
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.running = False
+        error = await self._close_started(exc_type, exc_val, exc_tb)
+        if error is not None:
+            raise error
+
+    async def _close_started(self, exc_type, exc_val, exc_tb) -> Optional[Exception]:
+        """Close every started crawler, even if some fail, and return the first error."""
+        error = None
+        while self._started:
+            crawler = self._started.pop()
+            try:
+                await crawler.__aexit__(exc_type, exc_val, exc_tb)
+            except Exception as e:
+                error = error or e
+        self._load.clear()
+        return error
+
+    async def arun(self, *args, **kwargs):
+        # Fail fast rather than handing out a crawler that was never started or is closed
+        if not self.running:
+            raise RuntimeError("Crawler pool is not running")
+        async with self._slots:
+            if not self.running:
+                raise RuntimeError("Crawler pool is not running")
+            crawler = min(self._started, key=self._load.__getitem__)
+            self._load[crawler] += 1
+            try:
+                return await crawler.arun(*args, **kwargs)
+            finally:
+                if crawler in self._load:
+                    self._load[crawler] -= 1
+
 class BaseCrawler:
-    def __init__(self, db: Database, domain_exclusions: DomainExclusions, logger: Logger):
+    def __init__(self, db: Database, domain_exclusions: DomainExclusions, logger: Logger,
+                 crawler: Optional[Union[AsyncWebCrawler, CrawlerPool]] = None):
         self.db = db
         self.domain_exclusions = domain_exclusions
         self.logger = logger
-        self.crawler = AsyncWebCrawler()
+        # A crawler passed in is shared and managed by its owner; only start/stop our own
+        self._owns_crawler = crawler is None
+        self.crawler = crawler if crawler is not None else AsyncWebCrawler()
 
     async def __aenter__(self):
-        await self.crawler.__aenter__()
+        if self._owns_crawler:
+            await self.crawler.__aenter__()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.crawler.__aexit__(exc_type, exc_val, exc_tb)
+        if self._owns_crawler:
+            await self.crawler.__aexit__(exc_type, exc_val, exc_tb)
 
     def should_skip_url(self, url: str) -> Tuple[bool, str]:
         # Skip about: or chrome: URLs
@@ -42,12 +110,13 @@ class BaseCrawler:
             title = crawl_result.metadata.get('title') or default_title or url.split("/")[-1]
             content = crawl_result.markdown
 
-            self.db.add_history(
+            # Only report success once the writer thread has committed the row
+            await asyncio.wrap_future(self.db.add_history(
                 url=url,
                 title=title,
                 content=content,
                 created_timestamp=created_timestamp
-            )
+            ))
 
             return True, {
                 "url": url,
@@ -55,7 +124,7 @@ class BaseCrawler:
                 "status": "received"
             }
         except Exception as e:
-            self.logger.error(f"Error processing URL {url}: {str(e)}")
+            self.logger.error("Error processing URL %s: %s", url, e)
             return False, {
                 "url": url,
                 "title": default_title or url.split("/")[-1],
@@ -1,18 +1,25 @@
 import sqlite3
-from datetime import datetime
-from typing import Optional, List, Dict
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Set
+from concurrent.futures import Future
+import logging
+import queue
 import threading
+import time
 
 class Database:
-    _instance = None
-    _lock = threading.Lock()
+    # The writer thread commits once per batch of up to this many rows...
+    WRITE_BATCH_SIZE = 1000
+    # ...or after waiting this many seconds for more rows to arrive
+    WRITE_BATCH_WAIT = 0.2
+    # Seconds between WAL checkpoints run by the writer thread
+    CHECKPOINT_INTERVAL = 60
 
-    def __new__(cls):
-        with cls._lock:
-            if cls._instance is None:
-                cls._instance = super(Database, cls).__new__(cls)
-                cls._instance._initialize_db()
-            return cls._instance
+    def __init__(self, logger=None):
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        # Serializes writes (execute + commit) on the shared connection
+        self._lock = threading.Lock()
+        self._initialize_db()
 
     def _initialize_db(self):
         """Initialize the database connection and create tables if they don't exist."""
@@ -28,8 +35,10 @@ class Database:
             self.conn.execute('PRAGMA temp_store=MEMORY')   # Store temp tables and indices in memory
             self.conn.execute('PRAGMA cache_size=-64000')   # Use 64MB of memory for page cache
             self.conn.execute('PRAGMA foreign_keys=ON')     # Enable foreign key constraints
+            self.conn.execute('PRAGMA wal_autocheckpoint=10000')  # Leave routine checkpoints to the writer thread
+            self.conn.execute('PRAGMA mmap_size=268435456')  # Memory-map up to 256MB of the database file
         except Exception as e:
-            print(f"Error setting database PRAGMA options: {e}")
+            self.logger.error("Error setting database PRAGMA options: %s", e)
             # Optionally re-raise the exception if you want to halt execution
             raise
 
@@ -47,38 +56,209 @@ class Database:
             )
         ''')
 
-        # Add index on url column
-        self.cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_history_url ON history(url)
-        ''')
+        # Databases created before the url index was made unique have a plain
+        # idx_history_url, which makes the CREATE below a no-op, and may hold
+        # duplicate urls. Keep the first row per url and rebuild the index.
+        legacy_index = self.cursor.execute('''
+            SELECT 1 FROM pragma_index_list('history')
+            WHERE name = 'idx_history_url' AND "unique" = 0
+        ''').fetchone()
+        if legacy_index:
+            self.cursor.execute('''
+                DELETE FROM history
+                WHERE id NOT IN (SELECT MIN(id) FROM history GROUP BY url)
+            ''')
+            self.logger.warning(
+                "Removed %d duplicate history rows while making idx_history_url unique",
+                self.cursor.rowcount)
+            self.cursor.execute('DROP INDEX idx_history_url')
 
         # Add unique index on url column
         self.cursor.execute('''
             CREATE UNIQUE INDEX IF NOT EXISTS idx_history_url ON history(url)
         ''')
 
+        # Add index on created column for most-recent-first listing
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_history_created ON history(created DESC)
+        ''')
+
+        # Full-text index over title and content, kept in sync by triggers
+        fts_exists = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'"
+        ).fetchone() is not None
+        self.cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+                title, content, content='history', content_rowid='id'
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+                INSERT INTO history_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+                INSERT INTO history_fts(history_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE ON history BEGIN
+                INSERT INTO history_fts(history_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+                INSERT INTO history_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+            END
+        ''')
+        if not fts_exists:
+            # Index rows stored before the full-text table existed
+            self.cursor.execute("INSERT INTO history_fts(history_fts) VALUES ('rebuild')")
+
         self.conn.commit()
 
-    def add_history(self, url: str, title: str, content: str, created_timestamp: Optional[datetime] = None) -> int:
-        """Add a new history entry."""
-        now = datetime.utcnow()
-        created_time = created_timestamp if created_timestamp else now
+        # New history entries are queued and written in batches by a single
+        # writer thread, so each crawled page doesn't cost its own commit/fsync
+        self._write_queue = queue.Queue(maxsize=10000)
+        self._writer = threading.Thread(target=self._writer_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    def _writer_loop(self):
+        """Drain the write queue in batches until stopped, checkpointing the WAL periodically."""
+        wal_dirty = False
+        next_checkpoint = time.monotonic() + self.CHECKPOINT_INTERVAL
+        while True:
+            # Checkpoint between batches on a fixed cadence, so it never lands
+            # inside a write and still runs while writes keep trickling in
+            if time.monotonic() >= next_checkpoint:
+                if wal_dirty:
+                    self._checkpoint()
+                    wal_dirty = False
+                next_checkpoint = time.monotonic() + self.CHECKPOINT_INTERVAL
+
+            try:
+                batch = [self._write_queue.get(timeout=max(next_checkpoint - time.monotonic(), 0))]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.WRITE_BATCH_WAIT
+            while len(batch) < self.WRITE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            # None is the stop signal queued by close()
+            entries = [entry for entry in batch if entry is not None]
+            if entries:
+                try:
+                    self._write_batch(entries)
+                except Exception as e:
+                    # Never let a bad batch kill the writer thread
+                    self.logger.error("Unexpected error writing history entries: %s", e)
+                    for _, future in entries:
+                        if not future.done():
+                            future.set_exception(e)
+                wal_dirty = True
+            if len(entries) != len(batch):
+                return
+
+    def _insert_rows(self, rows):
+        """Insert history rows and commit, rolling back if any row fails."""
         with self._lock:
-            self.cursor.execute('''
-                INSERT INTO history (url, title, content, created, updated)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (url, title, content, created_time, now))
-            self.conn.commit()
-            return self.cursor.lastrowid
+            try:
+                # Duplicate urls are skipped; any other constraint failure still raises
+                self.conn.executemany('''
+                    INSERT INTO history (url, title, content, created, updated)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO NOTHING
+                ''', rows)
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+    def _write_batch(self, entries):
+        """Write queued (row, future) entries, resolving each future once its row is stored."""
+        try:
+            self._insert_rows([row for row, _ in entries])
+        except sqlite3.Error as e:
+            # Don't drop the whole batch for one bad row: retry them one at a time
+            self.logger.warning("Writing %d history entries failed (%s), retrying individually", len(entries), e)
+            for row, future in entries:
+                try:
+                    self._insert_rows([row])
+                except sqlite3.Error as row_error:
+                    self.logger.error("Error writing history entry for %s: %s", row[0], row_error)
+                    future.set_exception(row_error)
+                else:
+                    future.set_result(None)
+            return
+
+        for _, future in entries:
+            future.set_result(None)
+
+    def _checkpoint(self):
+        """Copy the WAL back into the database file and truncate it."""
+        try:
+            with self._lock:
+                self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except sqlite3.Error as e:
+            self.logger.error("Error checkpointing database WAL: %s", e)
+
+    def add_history(self, url: str, title: str, content: str, created_timestamp: Optional[datetime] = None) -> Future:
+        """Queue a new history entry for the background writer.
+
+        Returns a Future that resolves once the entry is committed (or skipped
+        as a duplicate url) and raises if it could not be written.
+        """
+        for name, value in (('url', url), ('title', title), ('content', content)):
+            if not isinstance(value, str):
+                raise ValueError(f"History {name} must be a string, got {type(value).__name__}")
+        if not self._writer.is_alive():
+            raise RuntimeError("History writer thread is not running")
+
+        now = datetime.now(timezone.utc)
+        created_time = created_timestamp if created_timestamp else now
+        future = Future()
+        try:
+            self._write_queue.put_nowait(((url, title, content, created_time, now), future))
+        except queue.Full:
+            raise RuntimeError("History write queue is full") from None
+        return future
 
     def get_history(self, limit: int = 100) -> List[Dict]:
         """Get history entries, ordered by most recent first."""
-        self.cursor.execute('''
+        rows = self.conn.execute('''
             SELECT * FROM history
             ORDER BY created DESC
             LIMIT ?
-        ''', (limit,))
-        return [dict(row) for row in self.cursor.fetchall()]
+        ''', (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def search_history(self, query: str, limit: int = 100) -> List[Dict]:
+        """Full-text search history titles and content, best matches first.
+
+        The query is taken as plain words, all of which must match; FTS5
+        operators and quotes in it are matched literally rather than parsed,
+        so any query text is valid. Raises sqlite3.Error only if the database
+        itself fails.
+        """
+        # Quote each word so user input can't form invalid FTS5 syntax
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        if not terms:
+            return []
+        rows = self.conn.execute('''
+            SELECT history.*, history_fts.rank AS rank
+            FROM history_fts
+            JOIN history ON history.id = history_fts.rowid
+            WHERE history_fts MATCH ?
+            ORDER BY history_fts.rank
+            LIMIT ?
+        ''', (' '.join(terms), limit)).fetchall()
+        return [dict(row) for row in rows]
 
     def update_history(self, id: int, title: Optional[str] = None,
                       content: Optional[str] = None) -> bool:
@@ -97,7 +277,7 @@ class Database:
             return False
 
         update_fields.append("updated = ?")
-        values.append(datetime.utcnow())
+        values.append(datetime.now(timezone.utc))
         values.append(id)
 
         with self._lock:
@@ -118,10 +298,40 @@ class Database:
 
     def url_exists(self, url: str) -> bool:
         """Check if a URL already exists in the database."""
-        self.cursor.execute('SELECT 1 FROM history WHERE url = ? LIMIT 1', (url,))
-        return self.cursor.fetchone() is not None
+        # Use a fresh cursor; self.cursor may be mid-write on a worker thread
+        row = self.conn.execute('SELECT 1 FROM history WHERE url = ? LIMIT 1', (url,)).fetchone()
+        return row is not None
+
+    def get_all_urls(self) -> Set[str]:
+        """Get the set of all URLs already stored in the database."""
+        return {row[0] for row in self.conn.execute('SELECT url FROM history')}
+
+    def close(self):
+        """Flush queued writes and close the database connection."""
+        global _db
+        if self._writer.is_alive():
+            self._write_queue.put(None)
+            self._writer.join()
+        self.conn.close()
+        # Let the next get_db() open a new connection instead of returning this one
+        if _db is self:
+            _db = None
 
     def __del__(self):
         """Cleanup database connection."""
-        if hasattr(self, 'conn'):
-            self.conn.close()
\ No newline at end of file
+        if hasattr(self, '_writer'):
+            self.close()
+        elif hasattr(self, 'conn'):
+            self.conn.close()
+
+_db: Optional[Database] = None
+
+def get_db() -> Database:
+    """Return the process-wide Database, creating it on first use.
+
+    Code that needs its own logger should build a Database directly.
+    """
+    global _db
+    if _db is None:
+        _db = Database()
+    return _db
\ No newline at end of file
@@ -1,17 +1,70 @@
+import logging
+import os
+import re
 import yaml
-from fnmatch import fnmatch
-from urllib.parse import urlparse
+from functools import lru_cache
+
+# Use libyaml's C loader when PyYAML was built with it
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Parsed config files keyed by path, reused while their (mtime, size) is unchanged
+_config_cache = {}
+
+def _load_yaml(config_path):
+    """Parse a YAML file, returning the cached result if the file hasn't changed."""
+    st = os.stat(config_path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _config_cache.get(config_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(config_path, 'r') as f:
+        config = yaml.load(f, Loader=_YamlLoader)
+    _config_cache[config_path] = (key, config)
+    return config
+
+# urlparse only recognises a scheme that starts with a letter
+_SCHEME_RE = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*')
+
+def _split_netloc_path(url):
+    """Return the (netloc, path) of a URL without building a full urlparse result.
+
+    Only handles what the exclusion check needs: the netloc following a valid
+    'scheme://' (or a leading '//'), and the path up to any query string or
+    fragment. URLs without an authority component return an empty netloc.
+    Raises ValueError for an unbalanced '[' or ']' in the netloc, like urlparse.
+    """
+    if url.startswith('//'):
+        start = 2
+    else:
+        colon = url.find(':')
+        if colon < 0 or not url.startswith('//', colon + 1) or not _SCHEME_RE.fullmatch(url, 0, colon):
+            return '', ''
+        start = colon + 3
+
+    end = len(url)
+    for ch in ('?', '#'):
+        i = url.find(ch, start, end)
+        if i >= 0:
+            end = i
+
+    slash = url.find('/', start, end)
+    netloc_end = end if slash < 0 else slash
+    netloc = url[start:netloc_end]
+    if ('[' in netloc) != (']' in netloc):
+        raise ValueError("Invalid IPv6 URL")
+    return netloc, url[netloc_end:end]
 
 class DomainExclusions:
-    def __init__(self, config_path="config/history_config.yaml"):
+    def __init__(self, config_path="config/history_config.yaml", logger=None):
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
         self.excluded_domains = []
         self.load_config(config_path)
 
     def load_config(self, config_path):
         """Load excluded domains from the YAML configuration file."""
         try:
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            config = _load_yaml(config_path)
 
             # Handle both direct list and dict with 'excluded_domains' key
             if isinstance(config, list):
@@ -27,18 +80,40 @@ class DomainExclusions:
             ]
             # Optional: Warn if some patterns were ignored
             # if len(self.excluded_domains) != len(loaded_patterns):
-            #      print(f"Warning: Some invalid patterns were ignored in {config_path}")
+            #      self.logger.warning("Some invalid patterns were ignored in %s", config_path)
 
         except FileNotFoundError:
-            print(f"Warning: Configuration file {config_path} not found. No domains will be excluded.")
+            self.logger.warning("Configuration file %s not found. No domains will be excluded.", config_path)
             self.excluded_domains = [] # Ensure it's empty on error
         except yaml.YAMLError as e:
-            print(f"Error parsing YAML configuration: {e}")
+            self.logger.error("Error parsing YAML configuration: %s", e)
             self.excluded_domains = []
         except Exception as e: # Catch other potential errors
-            print(f"An unexpected error occurred during config loading: {e}")
+            self.logger.error("An unexpected error occurred during config loading: %s", e)
             self.excluded_domains = []
 
+        self._has_patterns = bool(self.excluded_domains)
+        # Path patterns need the full URL, the rest only look at the domain
+        path_patterns = [p.rstrip('/') for p in self.excluded_domains if '/' in p]
+        # Patterns still containing a '/' can only ever match as a prefix of
+        # domain + path, so they are combined into one anchored regex
+        prefixes = [p for p in path_patterns if '/' in p]
+        self._path_prefix_re = re.compile('|'.join(re.escape(p) for p in prefixes)) if prefixes else None
+        # Ones like "github.com/" are left as a bare domain and also have a root-path rule
+        self._bare_path_patterns = [p for p in path_patterns if '/' not in p]
+        domain_patterns = [p for p in self.excluded_domains if '/' not in p]
+        # A leading '.' only anchors the match to a label boundary, which the
+        # suffix lookup in _match_domain already guarantees
+        self._domain_suffixes = frozenset(p[1:] if p.startswith('.') else p for p in domain_patterns)
+        # All substring patterns are searched for in a single pass over the domain
+        substring_patterns = [p for p in domain_patterns if p.startswith('.') or p.endswith('.')]
+        self._substring_re = (
+            re.compile('|'.join(re.escape(p) for p in substring_patterns)) if substring_patterns else None
+        )
+        # History and websocket traffic keep revisiting the same hosts, so cache
+        # the domain checks. Rebuilt on every load so a reload drops stale results.
+        self._is_domain_excluded = lru_cache(maxsize=4096)(self._match_domain)
+
     def is_excluded(self, url_string):
         if not url_string or not isinstance(url_string, str):
             return True # Exclude invalid URLs
@@ -46,15 +121,17 @@ class DomainExclusions:
         input_url_stripped = url_string.strip()
 
         try:
-            parsed_url = urlparse(input_url_stripped)
-            domain = parsed_url.netloc
+            domain, path = _split_netloc_path(input_url_stripped)
 
             # Basic check: if domain itself is empty (can happen with file:// URLs etc.)
             if not domain:
                 return True # Exclude URLs without a domain
 
+            # Nothing else to check when no patterns are configured
+            if not self._has_patterns:
+                return False
+
             # Combine domain and path for path-specific exclusions
-            path = parsed_url.path if parsed_url.path else ''
             # Ensure path starts with / if it exists and isn't empty, handle root case
             if not path.startswith('/') and path:
                  path = '/' + path
@@ -63,52 +140,55 @@ class DomainExclusions:
             domain_and_path = domain + path
 
 
-            for pattern in self.excluded_domains:
-                # 1. Check for path-specific patterns first (more specific)
-                #    Use startswith for patterns like "github.com/settings"
-                #    Ensure pattern doesn't end with '/' unless path is just '/'
-                if '/' in pattern:
-                     # Normalize pattern ending for comparison
-                     normalized_pattern = pattern.rstrip('/')
-                     normalized_domain_path = domain_and_path.rstrip('/')
-                     # Handle root path case explicitly
-                     if normalized_pattern == domain and path == '/':
-                         # print(f"DEBUG: URL '{url_string}' excluded by root path pattern '{pattern}'")
-                         return True
-                     if normalized_domain_path.startswith(normalized_pattern) and normalized_pattern != domain:
-                         # print(f"DEBUG: URL '{url_string}' excluded by path pattern '{pattern}' matching '{normalized_domain_path}'")
-                         return True
-                     continue # Don't check domain ending if it was a path pattern
-
-                # 2. Check if the domain ends with the pattern (handles subdomains)
-                #    Also check for exact match.
-                #    Example: domain "ap.www.namecheap.com" ends with pattern "namecheap.com"
-                #    Example: domain "localhost" matches pattern "localhost"
-                #    Add '.' prefix for endswith check to avoid partial matches like 'example.com' matching 'ample.com'
-                pattern_for_endswith = '.' + pattern if not pattern.startswith('.') else pattern
-                domain_for_endswith = '.' + domain
-
-                if domain == pattern or domain_for_endswith.endswith(pattern_for_endswith):
-                    # print(f"DEBUG: URL '{url_string}' excluded by domain pattern '{pattern}' matching domain '{domain}'")
+            # 1. Check for path-specific patterns first (more specific)
+            #    Prefix match for patterns like "github.com/settings", ignoring
+            #    trailing slashes on both sides
+            normalized_domain_path = domain_and_path.rstrip('/')
+            if self._path_prefix_re is not None and self._path_prefix_re.match(normalized_domain_path):
+                return True
+            for pattern in self._bare_path_patterns:
+                # A pattern naming just the domain only excludes its root path
+                if pattern == domain:
+                    if path == '/':
+                        return True
+                elif normalized_domain_path.startswith(pattern):
                     return True
 
-                # 3. Check for patterns intended to match anywhere (like "login.", ".auth.")
-                #    This is less precise but matches the original intent of some patterns.
-                #    Check within the domain part only.
-                if pattern.startswith('.') or pattern.endswith('.'):
-                    if pattern in domain:
-                         # print(f"DEBUG: URL '{url_string}' excluded by substring pattern '{pattern}' in domain '{domain}'")
-                         return True
-
+            if self._is_domain_excluded(domain):
+                return True
 
         except ValueError:
-             # Handle potential errors from urlparse on malformed URLs
-             print(f"Warning: Could not parse URL '{url_string}' for exclusion check.")
+             # Handle potential errors from parsing malformed URLs
+             self.logger.warning("Could not parse URL '%s' for exclusion check.", url_string)
              return True # Exclude unparseable URLs
         except Exception as e:
             # Log other errors during URL parsing or checking
-            print(f"Warning: Error processing URL '{url_string}' for exclusion: {e}")
+            self.logger.warning("Error processing URL '%s' for exclusion: %s", url_string, e)
             return True # Exclude URLs that cause errors during processing
 
         # If no patterns matched
+        return False
+
+    def _match_domain(self, domain):
+        """Check the domain-only (non-path) patterns against a bare domain."""
+        # 2. Check if the domain equals a pattern or is a subdomain of it by
+        #    looking up the domain and each suffix following a '.' in a set.
+        #    Example: domain "ap.www.namecheap.com" has suffix "namecheap.com"
+        #    Example: domain "localhost" matches pattern "localhost"
+        #    Only whole labels are tried, so 'example.com' never matches 'ample.com'
+        suffixes = self._domain_suffixes
+        if domain in suffixes:
+            return True
+        dot = domain.find('.')
+        while dot >= 0:
+            if domain[dot + 1:] in suffixes:
+                return True
+            dot = domain.find('.', dot + 1)
+
+        # 3. Check for patterns intended to match anywhere (like "login.", ".auth.")
+        #    This is less precise but matches the original intent of some patterns.
+        #    Check within the domain part only.
+        if self._substring_re is not None and self._substring_re.search(domain):
+            return True
+
         return False
\ No newline at end of file
@@ -1,5 +1,6 @@
 import logging
 from datetime import datetime
+from pathlib import Path
 from typing import Optional
 
 class Logger:
@@ -12,6 +13,9 @@ class Logger:
         return cls._instance
 
     def _initialize(self):
+        # Create logs directory on first use so importing modules doesn't touch the filesystem
+        Path('logs').mkdir(exist_ok=True)
+
         # Configure logging
         logging.basicConfig(
             level=logging.INFO,
@@ -23,14 +27,8 @@ class Logger:
         )
         self.logger = logging.getLogger(__name__)
 
-    def info(self, message: str):
-        self.logger.info(message)
-
-    def error(self, message: str):
-        self.logger.error(message)
-
-    def warning(self, message: str):
-        self.logger.warning(message)
-
-    def debug(self, message: str):
-        self.logger.debug(message)
\ No newline at end of file
+        # Expose the logging.Logger methods directly so each call skips a wrapper frame
+        self.info = self.logger.info
+        self.error = self.logger.error
+        self.warning = self.logger.warning
+        self.debug = self.logger.debug
\ No newline at end of file
@@ -4,118 +4,184 @@ import uvicorn
 from logger import Logger
 import os
 from database import Database
-from crawl4ai import AsyncWebCrawler
 from domain_exclusions import DomainExclusions
-from base_crawler import BaseCrawler
+from base_crawler import BaseCrawler, CrawlerPool
 import asyncio
+from collections import deque
 from contextlib import asynccontextmanager
+from typing import Optional
 from browser_history import get_history
 from dotenv import load_dotenv
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
 
 # Load environment variables
 load_dotenv()
 CRAWL_INTERVAL = int(os.getenv('CRAWL_INTERVAL', 30))  # Default to 30 seconds if not set
+MAX_PENDING_URLS = int(os.getenv('MAX_PENDING_URLS', 16))  # Per websocket connection
+CRAWLER_POOL_SIZE = int(os.getenv('CRAWLER_POOL_SIZE', 2))  # Each crawler runs its own browser
+CRAWLS_PER_CRAWLER = int(os.getenv('CRAWLS_PER_CRAWLER', 4))  # Pages crawled at once per browser
+
+# Set up in lifespan rather than at import, so importing this module doesn't
+# configure logging or open the database
+logger: Optional[Logger] = None
+db: Optional[Database] = None
+domain_exclusions: Optional[DomainExclusions] = None
+crawler_pool: Optional[CrawlerPool] = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global history_crawler
+    global logger, db, domain_exclusions, crawler_pool
+    logger = Logger()
+    # A fresh connection per lifespan, since it is closed again on shutdown
+    db = Database(logger=logger)
+    domain_exclusions = DomainExclusions(logger=logger)
+
     logger.info("Initializing crawler and loading browser history...")
+    started = False
     try:
-        # Initialize history crawler
-        history_crawler = HistoryCrawler(db, domain_exclusions, logger)
-        async with history_crawler:  # Use async context manager
-            outputs = get_history()
-            history_crawler.crawl_queue = outputs.histories
-            logger.info(f"Loaded {len(history_crawler.crawl_queue)} URLs from browser history")
-
-            # Start the crawler in the background
+        # Start the shared crawlers once; the history crawler and every
+        # websocket connection borrow from this pool
+        crawler_pool = CrawlerPool(CRAWLER_POOL_SIZE, CRAWLS_PER_CRAWLER)
+        history_crawler = HistoryCrawler(db, domain_exclusions, logger, crawler=crawler_pool)
+        async with crawler_pool, history_crawler:
+            # Start the crawler in the background, it loads the browser history itself
             task = asyncio.create_task(history_crawler.start_crawler())
+            started = True
             yield
             # Stop the crawler
             history_crawler.is_running = False
             await task  # Wait for crawler to finish
 
     except Exception as e:
-        logger.error(f"Error during startup: {str(e)}")
-        yield
+        if started:
+            logger.error("Error during shutdown: %s", e)
+        else:
+            # Without crawlers there is nothing to serve, so don't start at all
+            logger.error("Error during startup: %s", e)
+            raise
+    finally:
+        # Flush history entries still queued for the writer thread
+        db.close()
 
 app = FastAPI(lifespan=lifespan)
-logger = Logger()
-
-db = Database()
-domain_exclusions = DomainExclusions()
 
 class HistoryCrawler(BaseCrawler):
-    def __init__(self, db: Database, domain_exclusions: DomainExclusions, logger: Logger):
-        super().__init__(db, domain_exclusions, logger)
-        self.crawl_queue = []
+    def __init__(self, db: Database, domain_exclusions: DomainExclusions, logger: Logger,
+                 crawler: Optional[CrawlerPool] = None):
+        super().__init__(db, domain_exclusions, logger, crawler=crawler)
+        self.crawl_queue = deque()
         self.is_running = True
 
+    def queue_history(self, histories):
+        """Queue browser history entries that are not stored yet, keeping only the first visit of each URL."""
+        # One query up front instead of a url_exists lookup per history entry
+        seen_urls = self.db.get_all_urls()
+        for timestamp, url, title in histories:
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+            self.crawl_queue.append((timestamp, url, title))
+
+    def load_history(self):
+        """Load browser history into the crawl queue. Blocking, run it on a worker thread."""
+        self.queue_history(get_history().histories)
+        self.logger.info("Loaded %d URLs from browser history", len(self.crawl_queue))
+
     async def start_crawler(self):
+        # Reading the browsers' history databases can take a while, so do it off
+        # the event loop and let websocket clients connect in the meantime
+        try:
+            await asyncio.to_thread(self.load_history)
+        except Exception as e:
+            self.logger.error("Error loading browser history: %s", e)
+            return
+
         while self.is_running and self.crawl_queue:
-            timestamp, url, title = self.crawl_queue.pop(0)
+            timestamp, url, title = self.crawl_queue.popleft()
 
             should_skip, skip_reason = self.should_skip_url(url)
             if should_skip:
-                self.logger.info(f"Skipping URL from history: {url} ({skip_reason})")
+                self.logger.info("Skipping URL from history: %s (%s)", url, skip_reason)
                 continue
 
             success, result = await self.crawl_url(url, title, created_timestamp=timestamp)
             if success:
-                self.logger.info(f"Processed historical URL: {url}")
+                self.logger.info("Processed historical URL: %s", url)
 
             await asyncio.sleep(CRAWL_INTERVAL)  # Use environment variable for interval
 
+async def process_websocket_url(websocket: WebSocket, ws_crawler: BaseCrawler, data: dict):
+    url = None
+    timestamp = None
+    try:
+        # Read the message inside the try so a malformed one is answered, not lost
+        url = data["url"]
+        timestamp = data["timestamp"]
+
+        should_skip, skip_reason = ws_crawler.should_skip_url(url)
+        if should_skip:
+            logger.info("Skipping URL: %s (%s)", url, skip_reason)
+            status, title = "skipped", skip_reason
+        else:
+            success, result = await ws_crawler.crawl_url(url)
+            status, title = result["status"], result["title"]
+    except Exception as e:
+        logger.error("Error handling websocket URL %s: %s", url, e)
+        if url is None:
+            # Nothing the client could match a reply to
+            return
+        status, title = "error", str(e)
+
+    try:
+        await websocket.send_json({
+            "status": status,
+            "data": {
+                "url": url,
+                "title": title,
+                "timestamp": timestamp
+            }
+        })
+    except Exception as e:
+        # Usually the client went away before we could reply
+        logger.info("Could not send result for %s: %s", url, e)
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("New WebSocket connection established")
 
-    ws_crawler = BaseCrawler(db, domain_exclusions, logger)
+    # Crawl with the shared pool rather than starting a browser per connection;
+    # the pool also caps how many pages are crawled at once
+    ws_crawler = BaseCrawler(db, domain_exclusions, logger, crawler=crawler_pool)
+    tasks = set()
+    # Caps the URLs this connection has in flight; once full, stop reading
+    # messages until one finishes instead of piling up tasks
+    pending = asyncio.Semaphore(MAX_PENDING_URLS)
 
     try:
         while True:
             data = await websocket.receive_json()
-            url = data["url"]
-
-            should_skip, skip_reason = ws_crawler.should_skip_url(url)
-            if should_skip:
-                logger.info(f"Skipping URL: {url} ({skip_reason})")
-                await websocket.send_json({
-                    "status": "skipped",
-                    "data": {
-                        "url": url,
-                        "title": skip_reason,
-                        "timestamp": data["timestamp"]
-                    }
-                })
-                continue
-
-            success, result = await ws_crawler.crawl_url(url)
-            await websocket.send_json({
-                "status": result["status"],
-                "data": {
-                    "url": result["url"],
-                    "title": result["title"],
-                    "timestamp": data["timestamp"]
-                }
-            })
+            # Handle each URL in its own task so a burst of pages is crawled concurrently
+            await pending.acquire()
+            task = asyncio.create_task(process_websocket_url(websocket, ws_crawler, data))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: pending.release())
 
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed by client")
     except Exception as e:
-        logger.error(f"WebSocket error: {str(e)}")
+        logger.error("WebSocket error: %s", e)
         try:
             await websocket.close()
         except RuntimeError:
             # Connection might already be closed
             pass
     finally:
+        # Let in-flight crawls finish so their pages are still stored
+        await asyncio.gather(*tasks, return_exceptions=True)
         logger.info("WebSocket connection closed")
 
 if __name__ == "__main__":
-    logger.info("Starting WebSocket server...")
+    Logger().info("Starting WebSocket server...")
     uvicorn.run(app, host="0.0.0.0", port=8523)